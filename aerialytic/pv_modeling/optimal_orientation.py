@@ -1,6 +1,20 @@
+import multiprocessing
+import os
+import numpy as np
 import pandas as pd
 import pvlib
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+try:
+    import numba
+    from numba import njit, prange
+except ImportError:  # Numba is optional, the search falls back to NumPy broadcasting
+    numba = None
+    njit = None
+    prange = range
 
 
 # Citations:
@@ -12,14 +26,234 @@ from datetime import datetime, timedelta
 #   horizontal data. Duffie, J.A., and Beckman, W.A. (2013). "Solar Engineering
 #   of Thermal Processes". 4th Edition. Wiley.
 
+# Ground reflectance (ρ) used for the reflected component, pvlib's default albedo.
+ALBEDO = 0.25
+
+# The search first scans the whole tilt/azimuth range on a coarse grid, then refines
+# on a 1° grid within ± FINE_WINDOW degrees of the best coarse orientation.
+COARSE_STEP = 15
+FINE_WINDOW = 15
+
+# Smallest batch get_optimal_orientation_batch spreads over worker processes by default,
+# below it spawning the workers takes longer than the searches.
+BATCH_POOL_THRESHOLD = 64
+
+# Ranking orientations does not need every hour: both passes run on one hour in SEARCH_STRIDE,
+# and the best CONFIRM_CANDIDATES orientations are re-scored on all of them.
+SEARCH_STRIDE = 3
+CONFIRM_CANDIDATES = 3
+
+
+def _sun_vectors(solar_zenith, solar_azimuth) -> np.ndarray:
+    """
+    Converts hourly solar zenith and azimuth angles (degrees) to unit vectors pointing at the sun.
+
+    Returns:
+        np.ndarray: (east, north, up) components with shape (3, hours).
+    """
+    zenith = np.radians(solar_zenith)
+    azimuth = np.radians(solar_azimuth)
+    sin_zenith = np.sin(zenith)
+    return np.stack([sin_zenith * np.sin(azimuth), sin_zenith * np.cos(azimuth), np.cos(zenith)])
+
+
+def _beam_irradiance_numpy(normals, sun, dni) -> np.ndarray:
+    """
+    Sums Gb = Gbn × cos(θ) over the hours for every surface normal with NumPy.
+
+    Works one tilt at a time through a single reused (azimuths, hours) buffer rather
+    than allocating the full (tilts, azimuths, hours) tensor.
+    """
+    n_tilts, n_azimuths, _ = normals.shape
+    beam = np.empty((n_tilts, n_azimuths), dtype=np.result_type(sun, dni))
+    cos_aoi = np.empty((n_azimuths, dni.shape[0]), dtype=beam.dtype)
+    for i in range(n_tilts):
+        np.matmul(normals[i], sun, out=cos_aoi)
+        np.maximum(cos_aoi, 0, out=cos_aoi)
+        np.matmul(cos_aoi, dni, out=beam[i])
+    return beam
+
+
+def _beam_irradiance_loops(normals, sun, dni):
+    """Sums Gb = Gbn × cos(θ) over the hours for every surface normal, one orientation per thread."""
+    n_tilts, n_azimuths, _ = normals.shape
+    n_hours = dni.shape[0]
+    beam = np.empty((n_tilts, n_azimuths))
+    for k in prange(n_tilts * n_azimuths):
+        i = k // n_azimuths
+        j = k % n_azimuths
+        east = normals[i, j, 0]
+        north = normals[i, j, 1]
+        up = normals[i, j, 2]
+        zero = np.float32(0.0)
+        total = 0.0  # accumulated in double precision
+        for h in range(n_hours):
+            cos_aoi = east * sun[0, h] + north * sun[1, h] + up * sun[2, h]
+            total += dni[h] * max(cos_aoi, zero)
+        beam[i, j] = total
+    return beam
+
+
+if njit is not None:
+    _beam_irradiance_parallel = njit(parallel=True, fastmath=True, cache=True, nogil=True)(_beam_irradiance_loops)
+    # Numba's workqueue threading layer (used when neither TBB nor OpenMP is installed)
+    # aborts the process if parallel kernels are launched from several threads at once,
+    # as threaded servers do. A call already spreads over every core, so serializing
+    # calls costs little throughput.
+    _beam_irradiance_lock = threading.Lock()
+
+    def _beam_irradiance(normals, sun, dni):
+        with _beam_irradiance_lock:
+            return _beam_irradiance_parallel(normals, sun, dni)
+else:
+    _beam_irradiance = _beam_irradiance_numpy
+
+
+def _annual_irradiance(tilts, azimuths, sun, dni, ghi, dhi) -> np.ndarray:
+    """
+    Sums the hourly plane-of-array irradiance for every (tilt, azimuth) pair.
+
+    Args:
+        tilts: Surface tilts in degrees.
+        azimuths: Surface azimuths in degrees.
+        sun: Hourly sun vectors from _sun_vectors, shape (3, hours).
+        dni, ghi, dhi: Hourly direct normal, global horizontal and diffuse horizontal irradiance.
+
+    Returns:
+        np.ndarray: Annual irradiance (W/m² summed over the hours) with shape (len(tilts), len(azimuths)).
+    """
+    tilt = np.radians(np.asarray(tilts, dtype=float))[:, None]
+    azimuth = np.radians(np.asarray(azimuths, dtype=float))
+    cos_tilt = np.cos(tilt)
+    sin_tilt = np.sin(tilt)
+
+    # Formula 3: Angle of Incidence
+    # cos(θ) = cos(θz) × cos(β) + sin(θz) × sin(β) × cos(γs - γ)
+    # which is the dot product of the surface normal and the sun vector.
+    normals = np.stack(
+        np.broadcast_arrays(sin_tilt * np.sin(azimuth), sin_tilt * np.cos(azimuth), cos_tilt), axis=-1
+    ).astype(sun.dtype)
+
+    # Formula 2: Liu and Jordan Model, Gt = Gb + Gd + Gr
+    # Gb = Gbn × cos(θ), zero when the sun is behind the panel
+    beam = _beam_irradiance(normals, sun, dni)
+
+    # The diffuse and reflected components only depend on the tilt, so they are summed
+    # over the hours before being scaled:
+    # Gd = Gdh × (1 + cos(β)) / 2
+    # Gr = (Gbh + Gdh) × ρ × (1 - cos(β)) / 2
+    diffuse = dhi.sum() * (1 + cos_tilt) / 2 + ghi.sum() * ALBEDO * (1 - cos_tilt) / 2
+
+    return beam + diffuse
+
+
+def _tz_offset(longitude: float) -> int:
+    """Returns the whole-hour UTC offset of the solar time at the given longitude."""
+    # Formula 7: Time Zone Calculation
+    # tz_offset = longitude / 15 (15° per hour)
+    return int(longitude / 15)
+
+
+@lru_cache(maxsize=256)
+def _location(latitude: float, longitude: float) -> pvlib.location.Location:
+    """Returns the pvlib Location for the coordinates, shared across searches and days."""
+    # pvlib reads every datetime.timezone as UTC, so it gets the offset in hours instead
+    return pvlib.location.Location(latitude, longitude, tz=_tz_offset(longitude))
+
 
-def get_optimal_orientation(latitude: float, longitude: float, ground_slope_offset: float = 0.0) -> dict:
+@lru_cache(maxsize=128)
+def _hourly_inputs(latitude: float, longitude: float, start_date: date) -> tuple:
+    """
+    Builds the hourly solar position and clear-sky irradiance for the year starting at start_date.
+
+    The solar position and clear-sky models dominate the cost of a search and only depend
+    on the location and the day, so the results are cached and returned as read-only arrays.
+
+    Returns:
+        tuple: (sun, dni, ghi, dhi, search_hours), where sun holds the hourly sun vectors from
+               _sun_vectors and search_hours indexes the hours the orientation search runs on.
+    """
+    tz = timezone(timedelta(hours=_tz_offset(longitude)))
+    location = _location(latitude, longitude)
+    
+    start = datetime.combine(start_date, datetime.min.time())
+    end = start + timedelta(days=365)
+    
+    times = pd.date_range(start=start, end=end, freq='1h', tz=tz)
+    
+    # Formula 1: Solar Position Calculations
+    # pvlib calculates: declination (δ), hour angle (ω), zenith angle (θz), azimuth (γs)
+    solar_position = location.get_solarposition(times)
+    solar_zenith = solar_position['apparent_zenith'].to_numpy()
+    solar_azimuth = solar_position['azimuth'].to_numpy()
+
+    # The clear-sky irradiance is zero with the sun below the horizon, so the clear-sky
+    # model only runs for, and the search only sees, daylight hours.
+    daylight = solar_zenith < 90
+
+    # Formula 5: Clear Sky Model (Ineichen-Perez)
+    # Calculates DNI, GHI, DHI using atmospheric models
+    clearsky = location.get_clearsky(times[daylight], solar_position=solar_position[daylight])
+
+    # Missing hours contribute nothing to the annual sums, like a NaN-skipping pandas sum.
+    # Single precision is plenty to rank orientations and halves the memory traffic of
+    # the search kernels.
+    inputs = tuple(np.nan_to_num(array, nan=0.0).astype(np.float32) for array in (
+        _sun_vectors(solar_zenith[daylight], solar_azimuth[daylight]),
+        clearsky['dni'].to_numpy(),
+        clearsky['ghi'].to_numpy(),
+        clearsky['dhi'].to_numpy(),
+    ))
+
+    # Every SEARCH_STRIDE-th hour, shifted by an hour each day so the sample covers every
+    # hour of the day instead of always falling before or after solar noon.
+    hour = np.arange(len(solar_zenith))
+    search_hours = np.flatnonzero(((hour + hour // 24) % SEARCH_STRIDE == 0)[daylight])
+
+    inputs += (search_hours,)
+    for array in inputs:
+        array.flags.writeable = False
+    return inputs
+
+
+def get_hourly_inputs(latitude: float, longitude: float) -> tuple:
+    """
+    Returns the hourly inputs of the orientation search for the year starting today.
+
+    Callers evaluating several ground slopes for the same location can build these once
+    and pass them to get_optimal_orientation as precomputed.
+
+    Args:
+        latitude (float): Latitude of the location.
+        longitude (float): Longitude of the location.
+
+    Returns:
+        tuple: (sun, dni, ghi, dhi, search_hours) read-only arrays covering the daylight hours.
+    """
+    # Cached per location (to ~10 m) and day
+    return _hourly_inputs(round(latitude, 4), round(longitude, 4), date.today())
+
+
+def _best_orientation(candidates, sun, dni, ghi, dhi) -> tuple:
+    """Returns the (tilt, azimuth, annual irradiance) of the candidate with the highest annual irradiance."""
+    tilts = sorted({tilt for tilt, _ in candidates})
+    azimuths = sorted({azimuth for _, azimuth in candidates})
+    # One call over the few candidate tilts and azimuths, then only the candidates are compared
+    annual_irradiance = _annual_irradiance(tilts, azimuths, sun, dni, ghi, dhi)
+    scores = [float(annual_irradiance[tilts.index(tilt), azimuths.index(azimuth)]) for tilt, azimuth in candidates]
+    best = int(np.argmax(scores))
+    return candidates[best][0], candidates[best][1], scores[best]
+
+
+def get_optimal_orientation(
+    latitude: float, longitude: float, ground_slope_offset: float = 0.0, *, precomputed: tuple | None = None
+) -> dict:
     """
     Calculates the optimal tilt and azimuth for a given location, accounting for ground slope.
 
-    This function performs a search over a range of tilt and azimuth angles
-    to find the orientation that maximizes the total annual plane-of-array (POA)
-    irradiance, considering the ground slope offset.
+    This function performs a coarse-to-fine search over a range of tilt and azimuth
+    angles to find the orientation, to the nearest degree, that maximizes the total
+    annual plane-of-array (POA) irradiance, considering the ground slope offset.
 
     Mathematical Models Used:
     1. Solar Position Calculations (declination, hour angle, zenith angle, azimuth)
@@ -32,79 +266,55 @@ def get_optimal_orientation(latitude: float, longitude: float, ground_slope_offs
         longitude (float): Longitude of the location.
         ground_slope_offset (float): Angle between ground surface and horizontal line in degrees.
                                    Positive values indicate upward slope, negative downward.
+        precomputed (tuple): Hourly inputs from get_hourly_inputs for this location.
+                             Built (or read from the cache) when omitted.
 
     Returns:
         dict: A dictionary with 'optimal_tilt', 'optimal_azimuth', 'effective_tilt', and 'annual_irradiance_kwh_m2'.
     """
-    # Formula 7: Time Zone Calculation
-    # tz_offset = longitude / 15 (15° per hour)
-    tz_offset = int(longitude / 15)
-    if tz_offset >= 0:
-        tz = f'Etc/GMT-{tz_offset}'
-    else:
-        tz = f'Etc/GMT+{-tz_offset}'
+    if precomputed is None:
+        precomputed = get_hourly_inputs(latitude, longitude)
+    sun, dni, ghi, dhi, search_hours = precomputed
 
-    location = pvlib.location.Location(latitude, longitude, tz=tz)
-    
-    today = datetime.now()
-    start_date = today.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_date = start_date + timedelta(days=365)
-    
-    times = pd.date_range(start=start_date, end=end_date, freq='1h', tz=tz)
-    
-    # Formula 1: Solar Position Calculations
-    # pvlib calculates: declination (δ), hour angle (ω), zenith angle (θz), azimuth (γs)
-    solar_position = location.get_solarposition(times)
-    
-    # Formula 5: Clear Sky Model (Ineichen-Perez)
-    # Calculates DNI, GHI, DHI using atmospheric models
-    clearsky = location.get_clearsky(times, solar_position=solar_position)
-    
     # Formula 4: Ground Slope Compensation
     # β_optimal = max(0, min(90, β_ideal - β_ground))
-    base_tilts = range(0, 91, 5)
-    tilts = [max(0, min(90, tilt - ground_slope_offset)) for tilt in base_tilts]
-    tilts = list(set(tilts))
-    tilts.sort()
-    
+    min_tilt = max(0, min(90, 0 - ground_slope_offset))
+    max_tilt = max(0, min(90, 90 - ground_slope_offset))
+
     # Formula 8: Hemisphere-Specific Azimuth Ranges
+    # Azimuths stay unwrapped during the search and are wrapped around 360 degrees at the end
     if latitude >= 0:  # Northern Hemisphere
-        azimuths = range(90, 271, 5)  # 180-degree range centered on South (180 deg)
+        min_azimuth, max_azimuth = 90, 270  # 180-degree range centered on South (180 deg)
     else:  # Southern Hemisphere
-        azimuths = range(270, 451, 5)  # 180-degree range centered on North (0/360 deg)
-        # Wrap around 360 degrees
-        azimuths = [az % 360 for az in azimuths]
-
-    max_irradiance = 0
-    optimal_tilt = 0
-    optimal_azimuth = 0
+        min_azimuth, max_azimuth = 270, 450  # 180-degree range centered on North (0/360 deg)
 
     # Formula 6: Annual Energy Optimization
     # E_annual = Σ(Gt(t) × η × A × Δt)
-    for tilt in tilts:
-        for azimuth in azimuths:
-            # Formula 2: Liu and Jordan Model
-            # Gt = Gb + Gd + Gr
-            # Where:
-            # Gb = Gbn × cos(θ)  (Formula 3: Angle of Incidence)
-            # Gd = Gdh × (1 + cos(β)) / 2
-            # Gr = (Gbh + Gdh) × ρ × (1 - cos(β)) / 2
-            poa_irradiance = pvlib.irradiance.get_total_irradiance(
-                surface_tilt=tilt,
-                surface_azimuth=azimuth,
-                solar_zenith=solar_position['apparent_zenith'],
-                solar_azimuth=solar_position['azimuth'],
-                dni=clearsky['dni'],
-                ghi=clearsky['ghi'],
-                dhi=clearsky['dhi']
-            )['poa_global']
-            
-            annual_irradiance = poa_irradiance.sum()
-            
-            if annual_irradiance > max_irradiance:
-                max_irradiance = annual_irradiance
-                optimal_tilt = tilt
-                optimal_azimuth = azimuth
+    # Annual irradiance is smooth and unimodal around the optimum, so a coarse scan
+    # of the whole range followed by a 1° scan around its best cell finds the optimum.
+    # take keeps the sun vectors C-contiguous, which the compiled kernel relies on to vectorize
+    sample = tuple(array.take(search_hours, axis=-1) for array in (sun, dni, ghi, dhi))
+    tilts = sorted({max(0, min(90, tilt - ground_slope_offset)) for tilt in range(0, 91, COARSE_STEP)})
+    azimuths = list(range(min_azimuth, max_azimuth + 1, COARSE_STEP))
+    coarse = _annual_irradiance(tilts, azimuths, *sample)
+    tilt_index = int(np.argmax(coarse.max(axis=1)))
+    coarse_tilt = tilts[tilt_index]
+    # A horizontal panel gets the same irradiance at every azimuth, so take the
+    # azimuth from the next tilt up when the best coarse tilt is flat.
+    if coarse_tilt == 0 and tilt_index + 1 < len(tilts):
+        tilt_index += 1
+    coarse_azimuth = azimuths[int(np.argmax(coarse[tilt_index]))]
+
+    steps = range(-FINE_WINDOW, FINE_WINDOW + 1)
+    tilts = sorted({max(min_tilt, min(max_tilt, coarse_tilt + step)) for step in steps})
+    azimuths = [coarse_azimuth + step for step in steps if min_azimuth <= coarse_azimuth + step <= max_azimuth]
+    fine = _annual_irradiance(tilts, azimuths, *sample)
+
+    # Re-score the best few orientations of the sampled search on every hour
+    ranked = np.argsort(-fine, axis=None, kind='stable')[:CONFIRM_CANDIDATES]
+    candidates = [(tilts[i], azimuths[j]) for i, j in zip(*np.unravel_index(ranked, fine.shape))]
+    optimal_tilt, optimal_azimuth, max_irradiance = _best_orientation(candidates, sun, dni, ghi, dhi)
+    optimal_azimuth %= 360
 
     # Formula 4: Effective Tilt Calculation
     # β_effective = β_panel + β_ground
@@ -119,6 +329,47 @@ def get_optimal_orientation(latitude: float, longitude: float, ground_slope_offs
     }
 
 
+def _get_optimal_orientation_for(coordinate: tuple) -> dict:
+    return get_optimal_orientation(*coordinate)
+
+
+def _init_batch_worker():
+    # Each worker already has a CPU to itself, so its kernels must not fan out to every core
+    if numba is not None:
+        numba.set_num_threads(1)
+
+
+def get_optimal_orientation_batch(coordinates, max_workers: int | None = None) -> list:
+    """
+    Calculates the optimal orientation for many locations, one worker process per CPU.
+
+    Each location is an independent search, so batches of rooftops scale with the
+    number of cores. Workers are spawned rather than forked because Numba's thread
+    pool is not safe to use in a forked child. Starting a worker costs about a second,
+    so by default batches smaller than BATCH_POOL_THRESHOLD run in this process.
+
+    Args:
+        coordinates: Iterable of (latitude, longitude) or (latitude, longitude, ground_slope_offset) tuples.
+        max_workers (int): Number of worker processes, defaults to the number of CPUs.
+                           With 1 the locations are calculated in this process.
+
+    Returns:
+        list: The get_optimal_orientation result for each location, in input order.
+    """
+    coordinates = [tuple(coordinate) for coordinate in coordinates]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+        if len(coordinates) < BATCH_POOL_THRESHOLD:
+            max_workers = 1
+    if max_workers == 1 or len(coordinates) <= 1:
+        return [_get_optimal_orientation_for(coordinate) for coordinate in coordinates]
+
+    # A few chunks per worker keeps them busy while amortizing the inter-process round trips
+    chunksize = max(1, len(coordinates) // (max_workers * 4))
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_batch_worker) as executor:
+        return list(executor.map(_get_optimal_orientation_for, coordinates, chunksize=chunksize))
+
 
 if __name__ == '__main__':
     # Example usage with ground slope offset:
@@ -128,8 +379,10 @@ if __name__ == '__main__':
     print("=== Solar Geometry Analysis ===")
     print(f"Location: New York (Lat: {latitude_ny}, Lon: {longitude_ny})")
     print()
+
+    hourly_inputs_ny = get_hourly_inputs(latitude_ny, longitude_ny)
     
-    optimal_ny = get_optimal_orientation(latitude_ny, longitude_ny, 15)
+    optimal_ny = get_optimal_orientation(latitude_ny, longitude_ny, 15, precomputed=hourly_inputs_ny)
     print(f"Ground Slope: 15° Upward")
     print(f"  Optimal Panel Tilt: {optimal_ny['optimal_tilt']}°")
     print(f"  Optimal Azimuth: {optimal_ny['optimal_azimuth']}°")
@@ -137,7 +390,7 @@ if __name__ == '__main__':
     print(f"  Annual Energy: {optimal_ny['annual_irradiance_kwh_m2']:.1f} kWh/m²")
     print()
 
-    optimal_ny_down = get_optimal_orientation(latitude_ny, longitude_ny, -10)
+    optimal_ny_down = get_optimal_orientation(latitude_ny, longitude_ny, -10, precomputed=hourly_inputs_ny)
     print(f"Ground Slope: 10° Downward")
     print(f"  Optimal Panel Tilt: {optimal_ny_down['optimal_tilt']}°")
     print(f"  Optimal Azimuth: {optimal_ny_down['optimal_azimuth']}°")
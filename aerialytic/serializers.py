@@ -0,0 +1,89 @@
+import math
+from rest_framework import serializers
+
+
+# Accepted input ranges in degrees. Coordinates outside ±90 (latitude) and ±180
+# (longitude) are normalized rather than rejected.
+COORDINATE_LIMIT = 360
+OFFSET_LIMIT = 90
+
+_OFFSET_RANGE_MESSAGE = (
+    f'Invalid input values: Offset (ground slope) must be between -{OFFSET_LIMIT} and {OFFSET_LIMIT} degrees'
+)
+
+
+def _coordinate_error_messages(name: str) -> dict:
+    range_message = (
+        f'Invalid input values: {name.capitalize()} must be between -{COORDINATE_LIMIT} and {COORDINATE_LIMIT}'
+    )
+    return {
+        'required': f'Missing required parameter: {name}',
+        'invalid': f'Invalid {name} value',
+        'null': f'Invalid {name} value',
+        'min_value': range_message,
+        'max_value': range_message,
+    }
+
+
+def _normalize_latitude(latitude: float) -> float:
+    """Reflects a latitude beyond the poles back into -90 to 90 (95 -> 85, 300 -> -60)."""
+    # Latitude is a triangle wave of period 360 peaking at the north pole. The shift
+    # keeps the fmod argument positive for every accepted input, where fmod and % agree.
+    return 90.0 - abs(math.fmod(latitude + 450.0, 360.0) - 180.0)
+
+
+def _normalize_longitude(longitude: float) -> float:
+    """Wraps a longitude into -180 to 180 (185 -> -175)."""
+    return math.fmod(longitude + 540.0, 360.0) - 180.0
+
+
+class _FiniteFloatField(serializers.FloatField):
+    """A FloatField that also rejects NaN and infinity, which have no JSON representation."""
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if not math.isfinite(value):
+            self.fail('invalid')
+        return value
+
+
+class SolarGeometrySerializer(serializers.Serializer):
+    """
+    Validates a solar geometry request and normalizes its coordinates.
+
+    Latitudes beyond ±90 are reflected back over the pole and longitudes are wrapped
+    to -180 to 180. A missing or null offset means flat ground.
+    """
+
+    latitude = _FiniteFloatField(
+        min_value=-COORDINATE_LIMIT, max_value=COORDINATE_LIMIT, error_messages=_coordinate_error_messages('latitude')
+    )
+    longitude = _FiniteFloatField(
+        min_value=-COORDINATE_LIMIT, max_value=COORDINATE_LIMIT, error_messages=_coordinate_error_messages('longitude')
+    )
+    offset = _FiniteFloatField(
+        min_value=-OFFSET_LIMIT,
+        max_value=OFFSET_LIMIT,
+        required=False,
+        allow_null=True,
+        default=0.0,
+        error_messages={
+            'invalid': 'Invalid offset value',
+            'min_value': _OFFSET_RANGE_MESSAGE,
+            'max_value': _OFFSET_RANGE_MESSAGE,
+        },
+    )
+
+    def validate(self, attrs):
+        offset = attrs['offset']
+        return {
+            'latitude': _normalize_latitude(attrs['latitude']),
+            'longitude': _normalize_longitude(attrs['longitude']),
+            'offset': 0.0 if offset is None else offset,
+        }
+
+    @property
+    def first_error(self) -> str:
+        """The first validation error, in field order, as a single message."""
+        errors = next(iter(self.errors.values()))
+        return str(errors[0])
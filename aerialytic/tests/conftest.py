@@ -1,42 +1,23 @@
 import os
 import django
-from django.conf import settings
+import pytest
+from django.test.utils import setup_test_environment, teardown_test_environment
+from pytest_django.lazy_django import django_settings_is_configured
 
-# Configure Django settings for testing
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'aerialytic.settings')
-django.setup()
 
-# Configure test settings
-if not settings.configured:
-    settings.configure(
-        DATABASES={
-            'default': {
-                'ENGINE': 'django.db.backends.sqlite3',
-                'NAME': ':memory:',
-            }
-        },
-        INSTALLED_APPS=[
-            'django.contrib.admin',
-            'django.contrib.auth',
-            'django.contrib.contenttypes',
-            'django.contrib.sessions',
-            'django.contrib.messages',
-            'django.contrib.staticfiles',
-            'aerialytic',
-        ],
-        MIDDLEWARE=[
-            'django.middleware.security.SecurityMiddleware',
-            'django.contrib.sessions.middleware.SessionMiddleware',
-            'django.middleware.common.CommonMiddleware',
-            'django.middleware.csrf.CsrfViewMiddleware',
-            'django.contrib.auth.middleware.AuthenticationMiddleware',
-            'django.contrib.messages.middleware.MessageMiddleware',
-            'django.middleware.clickjacking.XFrameOptionsMiddleware',
-        ],
-        ROOT_URLCONF='aerialytic.urls',
-        SECRET_KEY='test-secret-key',
-        DEBUG=True,
-        USE_TZ=True,
-        TIME_ZONE='UTC',
-    )
-    django.setup() 
\ No newline at end of file
+@pytest.fixture(scope='session')
+def django_env():
+    """Set up Django once per session, only for the tests that need it"""
+    # With --ds or DJANGO_SETTINGS_MODULE, pytest-django has already set up Django
+    # and its test environment
+    if django_settings_is_configured():
+        yield
+        return
+
+    # Configure Django settings for testing
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'aerialytic.settings')
+    django.setup()
+
+    setup_test_environment()
+    yield
+    teardown_test_environment()
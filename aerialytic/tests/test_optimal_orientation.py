@@ -1,8 +1,35 @@
+import os
+import subprocess
+import sys
+import textwrap
 import pytest
+from datetime import date
 from unittest.mock import patch, MagicMock
+import numpy as np
 import pandas as pd
+import pvlib
 
-from aerialytic.pv_modeling.optimal_orientation import get_optimal_orientation
+import aerialytic
+from aerialytic.pv_modeling.optimal_orientation import (
+    _annual_irradiance,
+    _beam_irradiance_loops,
+    _beam_irradiance_numpy,
+    _hourly_inputs,
+    _location,
+    _sun_vectors,
+    get_optimal_orientation,
+    get_optimal_orientation_batch,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_hourly_inputs_cache():
+    """pvlib is mocked per test, so cached locations and hourly inputs must not leak between tests"""
+    _location.cache_clear()
+    _hourly_inputs.cache_clear()
+    yield
+    _location.cache_clear()
+    _hourly_inputs.cache_clear()
 
 
 @pytest.fixture
@@ -18,6 +45,37 @@ def test_coordinates():
 
 class TestOptimalOrientation:
     
+    def test_beam_kernel_survives_concurrent_calls(self):
+        """Threads sharing the parallel kernel must not abort Numba's workqueue threading layer"""
+        pytest.importorskip('numba')
+        # The threading layer is fixed per process, so the calls run in a fresh interpreter
+        script = textwrap.dedent("""
+            import threading
+            import numpy as np
+            from aerialytic.pv_modeling.optimal_orientation import _annual_irradiance, _sun_vectors
+
+            sun = _sun_vectors(np.linspace(10, 80, 2000), np.linspace(90, 270, 2000)).astype(np.float32)
+            dni = np.full(2000, 800, dtype=np.float32)
+            zeros = np.zeros(2000, dtype=np.float32)
+
+            def search():
+                for _ in range(10):
+                    _annual_irradiance(list(range(0, 91)), list(range(90, 271)), sun, dni, zeros, zeros)
+
+            threads = [threading.Thread(target=search) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        """)
+        env = dict(os.environ, NUMBA_THREADING_LAYER='workqueue', NUMBA_NUM_THREADS='4')
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(aerialytic.__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [repo_root, env.get('PYTHONPATH')]))
+
+        completed = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True)
+
+        assert completed.returncode == 0, completed.stderr
+
     @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
     @patch('aerialytic.pv_modeling.optimal_orientation.pd.date_range')
     @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.irradiance.get_total_irradiance')
@@ -263,4 +321,247 @@ class TestOptimalOrientation:
             assert isinstance(result_max_offset, dict)
             
             result_min_offset = get_optimal_orientation(40.0, -74.0, -90.0)
-            assert isinstance(result_min_offset, dict) 
\ No newline at end of file
+            assert isinstance(result_min_offset, dict) 
+
+    def test_annual_irradiance_matches_pvlib_isotropic(self):
+        """The broadcast search must agree with pvlib's isotropic transposition"""
+        hours = np.arange(48)
+        solar_zenith = 20.0 + 70.0 * np.abs(np.sin(hours / 7.0))
+        solar_azimuth = (90.0 + 15.0 * hours) % 360
+        dni = 800.0 * np.cos(np.radians(solar_zenith))
+        ghi = 600.0 * np.cos(np.radians(solar_zenith))
+        dhi = np.full(hours.shape, 100.0)
+        tilts = [0, 25, 60, 90]
+        azimuths = [90, 180, 225, 0]
+
+        result = _annual_irradiance(tilts, azimuths, _sun_vectors(solar_zenith, solar_azimuth), dni, ghi, dhi)
+
+        assert result.shape == (len(tilts), len(azimuths))
+        for i, tilt in enumerate(tilts):
+            for j, azimuth in enumerate(azimuths):
+                expected = pvlib.irradiance.get_total_irradiance(
+                    surface_tilt=tilt,
+                    surface_azimuth=azimuth,
+                    solar_zenith=solar_zenith,
+                    solar_azimuth=solar_azimuth,
+                    dni=dni,
+                    ghi=ghi,
+                    dhi=dhi,
+                )['poa_global'].sum()
+                assert result[i, j] == pytest.approx(expected)
+
+    def test_numba_beam_kernel_matches_numpy(self):
+        """The JIT kernel must agree with the NumPy broadcast it replaces"""
+        numba = pytest.importorskip('numba')
+        rng = np.random.default_rng(0)
+        sun = _sun_vectors(rng.uniform(0, 120, 100), rng.uniform(0, 360, 100))
+        dni = rng.uniform(0, 900, 100)
+        normals = _sun_vectors(rng.uniform(0, 90, (5, 7)), rng.uniform(0, 360, (5, 7))).transpose(1, 2, 0).copy()
+
+        jitted = numba.njit(parallel=True)(_beam_irradiance_loops)
+
+        np.testing.assert_allclose(jitted(normals, sun, dni), _beam_irradiance_numpy(normals, sun, dni))
+
+    @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
+    @patch('aerialytic.pv_modeling.optimal_orientation.pd.date_range')
+    def test_get_optimal_orientation_refines_to_one_degree(self, mock_date_range, mock_location):
+        """With only beam irradiance the optimum faces the sun, off the coarse grid"""
+        mock_loc = MagicMock()
+        mock_location.return_value = mock_loc
+        mock_loc.get_solarposition.return_value = pd.DataFrame({
+            'apparent_zenith': [37.0] * 24,
+            'azimuth': [199.0] * 24
+        })
+        mock_loc.get_clearsky.return_value = pd.DataFrame({
+            'dni': [800.0] * 24,
+            'ghi': [0.0] * 24,
+            'dhi': [0.0] * 24
+        })
+
+        result = get_optimal_orientation(40.7128, -74.0060, 0.0)
+
+        assert result['optimal_tilt'] == 37
+        assert result['optimal_azimuth'] == 199
+        assert result['annual_irradiance_kwh_m2'] == pytest.approx(800.0 * 24 / 1000)
+
+    @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
+    @patch('aerialytic.pv_modeling.optimal_orientation.pd.date_range')
+    def test_get_optimal_orientation_reuses_hourly_inputs(self, mock_date_range, mock_location, test_coordinates):
+        """Repeated calls for the same location only run the solar models once"""
+        mock_loc = MagicMock()
+        mock_location.return_value = mock_loc
+        mock_loc.get_solarposition.return_value = pd.DataFrame({
+            'apparent_zenith': [45.0] * 24,
+            'azimuth': [180.0] * 24
+        })
+        mock_loc.get_clearsky.return_value = pd.DataFrame({
+            'dni': [800.0] * 24,
+            'ghi': [600.0] * 24,
+            'dhi': [100.0] * 24
+        })
+
+        first = get_optimal_orientation(test_coordinates['latitude_ny'], test_coordinates['longitude_ny'], 0.0)
+        second = get_optimal_orientation(test_coordinates['latitude_ny'], test_coordinates['longitude_ny'], 15.0)
+
+        assert second['annual_irradiance_kwh_m2'] <= first['annual_irradiance_kwh_m2']
+        mock_location.assert_called_once()
+        mock_loc.get_solarposition.assert_called_once()
+        mock_loc.get_clearsky.assert_called_once()
+
+    @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
+    @patch('aerialytic.pv_modeling.optimal_orientation.pd.date_range')
+    def test_get_optimal_orientation_skips_missing_hours(self, mock_date_range, mock_location):
+        """Hours with missing solar data are left out of the annual sum"""
+        mock_loc = MagicMock()
+        mock_location.return_value = mock_loc
+        mock_loc.get_solarposition.return_value = pd.DataFrame({
+            'apparent_zenith': [37.0] * 24,
+            'azimuth': [199.0] * 24
+        })
+        mock_loc.get_clearsky.return_value = pd.DataFrame({
+            'dni': [800.0] * 20 + [float('nan')] * 4,
+            'ghi': [0.0] * 24,
+            'dhi': [0.0] * 24
+        })
+
+        result = get_optimal_orientation(40.7128, -74.0060, 0.0)
+
+        assert type(result['annual_irradiance_kwh_m2']) is float
+        assert result['annual_irradiance_kwh_m2'] == pytest.approx(800.0 * 20 / 1000)
+
+    @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
+    @patch('aerialytic.pv_modeling.optimal_orientation.pd.date_range')
+    def test_hourly_inputs_drop_night_hours(self, mock_date_range, mock_location):
+        """Hours with the sun below the horizon are not part of the search"""
+        mock_loc = MagicMock()
+        mock_location.return_value = mock_loc
+        mock_loc.get_solarposition.return_value = pd.DataFrame({
+            'apparent_zenith': [45.0] * 14 + [90.0] + [120.0] * 9,
+            'azimuth': [180.0] * 24
+        })
+        mock_loc.get_clearsky.return_value = pd.DataFrame({
+            'dni': [800.0] * 14,
+            'ghi': [600.0] * 14,
+            'dhi': [100.0] * 14
+        })
+
+        sun, dni, ghi, dhi, search_hours = _hourly_inputs(40.7128, -74.006, date(2024, 1, 1))
+
+        assert sun.shape == (3, 14)
+        assert len(dni) == len(ghi) == len(dhi) == 14
+        np.testing.assert_array_equal(search_hours, [0, 3, 6, 9, 12])
+        # The clear-sky model only runs for the daylight hours
+        solar_position = mock_loc.get_clearsky.call_args.kwargs['solar_position']
+        assert len(solar_position) == 14
+
+    def test_get_optimal_orientation_batch_keeps_order(self, test_coordinates):
+        """Batch results line up with the input coordinates"""
+        with patch('aerialytic.pv_modeling.optimal_orientation.get_optimal_orientation') as mock_orientation:
+            mock_orientation.side_effect = lambda latitude, longitude, offset=0.0: {
+                'latitude': latitude, 'longitude': longitude, 'ground_slope_offset': offset
+            }
+
+            results = get_optimal_orientation_batch([
+                (test_coordinates['latitude_ny'], test_coordinates['longitude_ny']),
+                (test_coordinates['latitude_sydney'], test_coordinates['longitude_sydney'], 10.0),
+            ], max_workers=1)
+
+        assert results == [
+            {'latitude': 40.7128, 'longitude': -74.0060, 'ground_slope_offset': 0.0},
+            {'latitude': -33.8688, 'longitude': 151.2093, 'ground_slope_offset': 10.0},
+        ]
+
+    def test_get_optimal_orientation_batch_small_batch_stays_in_process(self, test_coordinates):
+        """Small batches skip the worker pool unless workers are requested"""
+        with patch('aerialytic.pv_modeling.optimal_orientation.ProcessPoolExecutor') as mock_executor, \
+                patch('aerialytic.pv_modeling.optimal_orientation.get_optimal_orientation') as mock_orientation:
+            mock_orientation.return_value = {}
+
+            results = get_optimal_orientation_batch([
+                (test_coordinates['latitude_ny'], test_coordinates['longitude_ny']),
+                (test_coordinates['latitude_sydney'], test_coordinates['longitude_sydney']),
+            ])
+
+        assert results == [{}, {}]
+        mock_executor.assert_not_called()
+
+    def test_get_optimal_orientation_batch_worker_pool(self, test_coordinates):
+        """Worker processes return the same results, in input order, as the in-process search"""
+        coordinates = [
+            (test_coordinates['latitude_ny'], test_coordinates['longitude_ny']),
+            (test_coordinates['latitude_sydney'], test_coordinates['longitude_sydney'], 10.0),
+            (5.0, 20.0, -10.0),
+        ]
+
+        results = get_optimal_orientation_batch(coordinates, max_workers=2)
+
+        assert results == get_optimal_orientation_batch(coordinates, max_workers=1)
+
+    @pytest.mark.parametrize('latitude,offset', [(40.7128, 15.0), (40.7128, -10.0), (-33.8688, 0.0), (-33.8688, 90.0)])
+    @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
+    @patch('aerialytic.pv_modeling.optimal_orientation.pd.date_range')
+    def test_search_grids_have_no_duplicates(self, mock_date_range, mock_location, latitude, offset):
+        """Clamped tilts and wrapped azimuths are never evaluated twice in one pass"""
+        mock_loc = MagicMock()
+        mock_location.return_value = mock_loc
+        mock_loc.get_solarposition.return_value = pd.DataFrame({
+            'apparent_zenith': [45.0] * 24,
+            'azimuth': [180.0 if latitude >= 0 else 0.0] * 24
+        })
+        mock_loc.get_clearsky.return_value = pd.DataFrame({
+            'dni': [800.0] * 24,
+            'ghi': [600.0] * 24,
+            'dhi': [100.0] * 24
+        })
+
+        with patch(
+            'aerialytic.pv_modeling.optimal_orientation._annual_irradiance', wraps=_annual_irradiance
+        ) as spy:
+            get_optimal_orientation(latitude, 0.0, offset)
+
+        assert spy.call_count >= 2
+        for call in spy.call_args_list:
+            tilts, azimuths = call.args[:2]
+            assert len(set(tilts)) == len(tilts)
+            assert len({azimuth % 360 for azimuth in azimuths}) == len(azimuths)
+
+    @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
+    def test_get_optimal_orientation_with_precomputed_inputs(self, mock_location, test_coordinates):
+        """Precomputed hourly inputs skip the solar position and clear-sky models"""
+        precomputed = (
+            _sun_vectors(np.full(24, 37.0), np.full(24, 199.0)),
+            np.full(24, 800.0),
+            np.zeros(24),
+            np.zeros(24),
+            np.arange(0, 24, 3),
+        )
+
+        result = get_optimal_orientation(
+            test_coordinates['latitude_ny'], test_coordinates['longitude_ny'], 0.0, precomputed=precomputed
+        )
+
+        assert result['optimal_tilt'] == 37
+        assert result['optimal_azimuth'] == 199
+        mock_location.assert_not_called()
+
+    @patch('aerialytic.pv_modeling.optimal_orientation.pvlib.location.Location')
+    @patch('aerialytic.pv_modeling.optimal_orientation.pd.date_range')
+    def test_location_is_shared_across_days(self, mock_date_range, mock_location):
+        """A new day rebuilds the hourly inputs but reuses the Location"""
+        mock_loc = MagicMock()
+        mock_location.return_value = mock_loc
+        mock_loc.get_solarposition.return_value = pd.DataFrame({
+            'apparent_zenith': [45.0] * 24,
+            'azimuth': [180.0] * 24
+        })
+        mock_loc.get_clearsky.return_value = pd.DataFrame({
+            'dni': [800.0] * 24,
+            'ghi': [600.0] * 24,
+            'dhi': [100.0] * 24
+        })
+
+        _hourly_inputs(40.7128, -74.006, date(2024, 1, 1))
+        _hourly_inputs(40.7128, -74.006, date(2024, 1, 2))
+
+        mock_location.assert_called_once_with(40.7128, -74.006, tz=-4)
+        assert mock_loc.get_solarposition.call_count == 2
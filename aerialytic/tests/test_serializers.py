@@ -0,0 +1,36 @@
+import pytest
+from aerialytic.serializers import _normalize_latitude, _normalize_longitude
+
+
+@pytest.mark.parametrize('latitude, expected', [
+    (-400.0, -40.0),
+    (-270.0, 90.0),
+    (-180.0, 0.0),
+    (-95.0, -85.0),
+    (-90.0, -90.0),
+    (0.0, 0.0),
+    (40.7128, 40.7128),
+    (90.0, 90.0),
+    (95.0, 85.0),
+    (180.0, 0.0),
+    (300.0, -60.0),
+    (400.0, 40.0),
+])
+def test_normalize_latitude(latitude, expected):
+    """Latitudes beyond the poles are reflected back into -90 to 90"""
+    assert _normalize_latitude(latitude) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('longitude, expected', [
+    (-360.0, 0.0),
+    (-185.0, 175.0),
+    (-180.0, -180.0),
+    (-74.006, -74.006),
+    (0.0, 0.0),
+    (180.0, -180.0),
+    (185.0, -175.0),
+    (360.0, 0.0),
+])
+def test_normalize_longitude(longitude, expected):
+    """Longitudes are wrapped into -180 to 180"""
+    assert _normalize_longitude(longitude) == pytest.approx(expected)
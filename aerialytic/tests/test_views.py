@@ -1,13 +1,32 @@
 import json
 import pytest
-from django.test import Client
-from unittest.mock import patch
+from django.test import Client, RequestFactory
+from unittest.mock import MagicMock
+from aerialytic.views import _cached_orientation, _parse_json
 
 
-@pytest.fixture
+pytestmark = pytest.mark.usefixtures('django_env')
+
+
+@pytest.fixture(autouse=True)
+def mock_orientation(monkeypatch):
+    """Replaces the orientation search with a mock and starts every test with an empty cache"""
+    mock_func = MagicMock(return_value={
+        'optimal_tilt': 35.0,
+        'optimal_azimuth': 180.0,
+        'effective_tilt': 35.0,
+        'annual_irradiance_kwh_m2': 1500.5
+    })
+    monkeypatch.setattr('aerialytic.views.get_optimal_orientation', mock_func)
+    _cached_orientation.cache_clear()
+    yield mock_func
+    _cached_orientation.cache_clear()
+
+
+@pytest.fixture(scope='module')
 def client():
-    """Django test client fixture"""
-    return Client()
+    """Django test client fixture, shared by the tests in this module"""
+    return Client(HTTP_ACCEPT='application/json')
 
 
 @pytest.fixture
@@ -25,162 +44,50 @@ def test_api_url():
 class TestSolarGeometryAPIView:
     """Tests for the solar geometry API view"""
     
-    def test_valid_coordinates_no_offset(self, client, solar_geometry_url):
+    def test_valid_coordinates_no_offset(self, client, solar_geometry_url, mock_orientation):
         """Test API with valid coordinates and no offset"""
         data = {
             'latitude': 40.7128,
             'longitude': -74.0060
         }
         
-        with patch('aerialytic.views.get_optimal_orientation') as mock_func:
-            mock_result = {
-                'optimal_tilt': 35.0,
-                'optimal_azimuth': 180.0,
-                'effective_tilt': 35.0,
-                'annual_irradiance_kwh_m2': 1500.5
-            }
-            mock_func.return_value = mock_result
-            
-            response = client.post(
-                solar_geometry_url,
-                data=json.dumps(data),
-                content_type='application/json'
-            )
-            
-            assert response.status_code == 200
-            result = json.loads(response.content)
-            
-            # Use approximate comparison for floating point values
-            assert abs(result['latitude'] - 40.7128) < 0.001
-            assert abs(result['longitude'] - (-74.0060)) < 0.001
-            assert result['offset'] == 0.0
-            assert result['optimal_tilt'] == 35.0
-            assert result['optimal_azimuth'] == 180.0
-            assert result['effective_tilt'] == 35.0
-            assert result['annual_irradiance_kwh_m2'] == 1500.5
-            
-            # Check that the function was called with the correct arguments
-            mock_func.assert_called_once()
-            call_args = mock_func.call_args[0]
-            assert abs(call_args[0] - 40.7128) < 0.001  # latitude
-            assert abs(call_args[1] - (-74.0060)) < 0.001  # longitude
-            assert call_args[2] == 0.0  # offset
+        response = client.post(
+            solar_geometry_url,
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 200
+        result = json.loads(response.content)
+        
+        # Use approximate comparison for floating point values
+        assert abs(result['latitude'] - 40.7128) < 0.001
+        assert abs(result['longitude'] - (-74.0060)) < 0.001
+        assert result['offset'] == 0.0
+        assert result['optimal_tilt'] == 35.0
+        assert result['optimal_azimuth'] == 180.0
+        assert result['effective_tilt'] == 35.0
+        assert result['annual_irradiance_kwh_m2'] == 1500.5
+        
+        # Check that the function was called with the correct arguments
+        mock_orientation.assert_called_once()
+        call_args = mock_orientation.call_args[0]
+        assert abs(call_args[0] - 40.7128) < 0.001  # latitude
+        assert abs(call_args[1] - (-74.0060)) < 0.001  # longitude
+        assert call_args[2] == 0.0  # offset
     
-    def test_valid_coordinates_with_offset(self, client, solar_geometry_url):
+    def test_valid_coordinates_with_offset(self, client, solar_geometry_url, mock_orientation):
         """Test API with valid coordinates and positive offset"""
         data = {
             'latitude': 40.7128,
             'longitude': -74.0060,
             'offset': 15.0
         }
-        
-        with patch('aerialytic.views.get_optimal_orientation') as mock_func:
-            mock_result = {
-                'optimal_tilt': 20.0,
-                'optimal_azimuth': 180.0,
-                'effective_tilt': 35.0,
-                'annual_irradiance_kwh_m2': 1450.2
-            }
-            mock_func.return_value = mock_result
-            
-            response = client.post(
-                solar_geometry_url,
-                data=json.dumps(data),
-                content_type='application/json'
-            )
-            
-            assert response.status_code == 200
-            result = json.loads(response.content)
-            
-            assert result['offset'] == 15.0
-            assert result['optimal_tilt'] == 20.0
-            assert result['effective_tilt'] == 35.0
-            
-            # Check that the function was called with the correct arguments
-            mock_func.assert_called_once()
-            call_args = mock_func.call_args[0]
-            assert abs(call_args[0] - 40.7128) < 0.001  # latitude
-            assert abs(call_args[1] - (-74.0060)) < 0.001  # longitude
-            assert call_args[2] == 15.0  # offset
-    
-    def test_null_offset(self, client, solar_geometry_url):
-        """Test API with null offset value"""
-        data = {
-            'latitude': 40.7128,
-            'longitude': -74.0060,
-            'offset': None
-        }
-        
-        with patch('aerialytic.views.get_optimal_orientation') as mock_func:
-            mock_result = {
-                'optimal_tilt': 35.0,
-                'optimal_azimuth': 180.0,
-                'effective_tilt': 35.0,
-                'annual_irradiance_kwh_m2': 1500.5
-            }
-            mock_func.return_value = mock_result
-            
-            response = client.post(
-                solar_geometry_url,
-                data=json.dumps(data),
-                content_type='application/json'
-            )
-            
-            assert response.status_code == 200
-            result = json.loads(response.content)
-            assert result['offset'] == 0.0
-            
-            # Check that the function was called with the correct arguments
-            mock_func.assert_called_once()
-            call_args = mock_func.call_args[0]
-            assert abs(call_args[0] - 40.7128) < 0.001  # latitude
-            assert abs(call_args[1] - (-74.0060)) < 0.001  # longitude
-            assert call_args[2] == 0.0  # offset
-    
-    def test_coordinate_normalization(self, client, solar_geometry_url):
-        """Test coordinate normalization for out-of-range values"""
-        data = {
-            'latitude': 95.0,  # Should normalize to 85.0
-            'longitude': 185.0,  # Should normalize to -175.0
-            'offset': 0.0
-        }
-        
-        with patch('aerialytic.views.get_optimal_orientation') as mock_func:
-            mock_result = {
-                'optimal_tilt': 35.0,
-                'optimal_azimuth': 180.0,
-                'effective_tilt': 35.0,
-                'annual_irradiance_kwh_m2': 1500.5
-            }
-            mock_func.return_value = mock_result
-            
-            response = client.post(
-                solar_geometry_url,
-                data=json.dumps(data),
-                content_type='application/json'
-            )
-            
-            assert response.status_code == 200
-            result = json.loads(response.content)
-            
-            # Check that coordinates were normalized correctly
-            # For latitude 95°, normalization should give 85° (not -85°)
-            assert abs(result['latitude'] - 85.0) < 0.001
-            assert abs(result['longitude'] - (-175.0)) < 0.001
-            
-            # Check that the function was called with the normalized coordinates
-            mock_func.assert_called_once()
-            call_args = mock_func.call_args[0]
-            assert abs(call_args[0] - 85.0) < 0.001  # normalized latitude
-            assert abs(call_args[1] - (-175.0)) < 0.001  # normalized longitude
-            assert call_args[2] == 0.0  # offset
-    
-    def test_invalid_latitude_range(self, client, solar_geometry_url):
-        """Test API with latitude outside valid range"""
-        data = {
-            'latitude': 500.0,  # Outside -360 to 360 range
-            'longitude': -74.0060,
-            'offset': 0.0
+        mock_orientation.return_value = {
+            'optimal_tilt': 20.0,
+            'optimal_azimuth': 180.0,
+            'effective_tilt': 35.0,
+            'annual_irradiance_kwh_m2': 1450.2
         }
         
         response = client.post(
@@ -189,16 +96,26 @@ class TestSolarGeometryAPIView:
             content_type='application/json'
         )
         
-        assert response.status_code == 400
+        assert response.status_code == 200
         result = json.loads(response.content)
-        assert 'Latitude must be between -360 and 360' in result['error']
+        
+        assert result['offset'] == 15.0
+        assert result['optimal_tilt'] == 20.0
+        assert result['effective_tilt'] == 35.0
+        
+        # Check that the function was called with the correct arguments
+        mock_orientation.assert_called_once()
+        call_args = mock_orientation.call_args[0]
+        assert abs(call_args[0] - 40.7128) < 0.001  # latitude
+        assert abs(call_args[1] - (-74.0060)) < 0.001  # longitude
+        assert call_args[2] == 15.0  # offset
     
-    def test_invalid_longitude_range(self, client, solar_geometry_url):
-        """Test API with longitude outside valid range"""
+    def test_null_offset(self, client, solar_geometry_url, mock_orientation):
+        """Test API with null offset value"""
         data = {
             'latitude': 40.7128,
-            'longitude': 500.0,  # Outside -360 to 360 range
-            'offset': 0.0
+            'longitude': -74.0060,
+            'offset': None
         }
         
         response = client.post(
@@ -207,16 +124,23 @@ class TestSolarGeometryAPIView:
             content_type='application/json'
         )
         
-        assert response.status_code == 400
+        assert response.status_code == 200
         result = json.loads(response.content)
-        assert 'Longitude must be between -360 and 360' in result['error']
+        assert result['offset'] == 0.0
+        
+        # Check that the function was called with the correct arguments
+        mock_orientation.assert_called_once()
+        call_args = mock_orientation.call_args[0]
+        assert abs(call_args[0] - 40.7128) < 0.001  # latitude
+        assert abs(call_args[1] - (-74.0060)) < 0.001  # longitude
+        assert call_args[2] == 0.0  # offset
     
-    def test_invalid_offset_range(self, client, solar_geometry_url):
-        """Test API with offset outside valid range"""
+    def test_coordinate_normalization(self, client, solar_geometry_url, mock_orientation):
+        """Test coordinate normalization for out-of-range values"""
         data = {
-            'latitude': 40.7128,
-            'longitude': -74.0060,
-            'offset': 95.0  # Outside -90 to 90 range
+            'latitude': 95.0,  # Should normalize to 85.0
+            'longitude': 185.0,  # Should normalize to -175.0
+            'offset': 0.0
         }
         
         response = client.post(
@@ -225,55 +149,127 @@ class TestSolarGeometryAPIView:
             content_type='application/json'
         )
         
-        assert response.status_code == 400
+        assert response.status_code == 200
         result = json.loads(response.content)
-        assert 'Offset (ground slope) must be between -90 and 90 degrees' in result['error']
-    
-    def test_missing_latitude(self, client, solar_geometry_url):
-        """Test API with missing latitude"""
-        data = {
-            'longitude': -74.0060,
-            'offset': 0.0
-        }
         
+        # Check that coordinates were normalized correctly
+        # For latitude 95°, normalization should give 85° (not -85°)
+        assert abs(result['latitude'] - 85.0) < 0.001
+        assert abs(result['longitude'] - (-175.0)) < 0.001
+        
+        # Check that the function was called with the normalized coordinates
+        mock_orientation.assert_called_once()
+        call_args = mock_orientation.call_args[0]
+        assert abs(call_args[0] - 85.0) < 0.001  # normalized latitude
+        assert abs(call_args[1] - (-175.0)) < 0.001  # normalized longitude
+        assert call_args[2] == 0.0  # offset
+
+    def test_success_body_is_exact(self, client, solar_geometry_url, mock_orientation):
+        """Test the success body is rendered byte for byte from the response template"""
+        mock_orientation.return_value = {
+            'optimal_tilt': 39,
+            'optimal_azimuth': 179,
+            'effective_tilt': 54.0,
+            'annual_irradiance_kwh_m2': 2420.6443
+        }
+
         response = client.post(
             solar_geometry_url,
-            data=json.dumps(data),
+            data=json.dumps({'latitude': 40.7128, 'longitude': -74.0060, 'offset': 15.0}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/json'
+        assert response.content == (
+            b'{"latitude":40.712800,"longitude":-74.006000,"offset":15.000,"optimal_tilt":39.000,'
+            b'"optimal_azimuth":179.000,"effective_tilt":54.000,"annual_irradiance_kwh_m2":2420.64}'
+        )
+
+    def test_offset_is_echoed_as_searched(self, client, solar_geometry_url, mock_orientation):
+        """Test the echoed offset is the rounded slope the search ran with"""
+        response = client.post(
+            solar_geometry_url,
+            data=json.dumps({'latitude': 40.7128, 'longitude': -74.0060, 'offset': 12.3456}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        assert json.loads(response.content)['offset'] == 12.35
+        assert mock_orientation.call_args[0][2] == 12.35
+
+    def test_nearby_requests_share_cached_result(self, client, solar_geometry_url, mock_orientation):
+        """Requests within the cache resolution reuse one orientation search"""
+        for latitude in (40.7128, 40.7131):
+            response = client.post(
+                solar_geometry_url,
+                data=json.dumps({'latitude': latitude, 'longitude': -74.0060}),
+                content_type='application/json'
+            )
+            assert response.status_code == 200
+            assert json.loads(response.content)['optimal_tilt'] == 35.0
+
+        mock_orientation.assert_called_once()
+
+    @pytest.mark.parametrize('body, message', [
+        (json.dumps({'latitude': 500.0, 'longitude': -74.0060, 'offset': 0.0}),
+         'Latitude must be between -360 and 360'),
+        (json.dumps({'latitude': 40.7128, 'longitude': 500.0, 'offset': 0.0}),
+         'Longitude must be between -360 and 360'),
+        (json.dumps({'latitude': 40.7128, 'longitude': -74.0060, 'offset': 95.0}),
+         'Offset (ground slope) must be between -90 and 90 degrees'),
+        (json.dumps({'longitude': -74.0060, 'offset': 0.0}), 'Missing required parameter: latitude'),
+        (json.dumps({'latitude': 40.7128, 'offset': 0.0}), 'Missing required parameter: longitude'),
+        (json.dumps({'latitude': 'nan', 'longitude': -74.0060}), 'Invalid latitude value'),
+        ('invalid json', 'unexpected character'),
+    ], ids=[
+        'latitude_range', 'longitude_range', 'offset_range', 'missing_latitude', 'missing_longitude',
+        'non_finite_latitude', 'invalid_json',
+    ])
+    def test_validation_errors(self, client, solar_geometry_url, body, message):
+        """Test API rejects invalid input with a descriptive error"""
+        response = client.post(
+            solar_geometry_url,
+            data=body,
             content_type='application/json'
         )
         
         assert response.status_code == 400
         result = json.loads(response.content)
-        assert 'Missing required parameter: latitude' in result['error']
+        assert message in result['error']
     
-    def test_missing_longitude(self, client, solar_geometry_url):
-        """Test API with missing longitude"""
+    def test_oversized_body_rejected(self, client, solar_geometry_url, mock_orientation):
+        """Test API refuses bodies over the size limit without running the search"""
         data = {
             'latitude': 40.7128,
-            'offset': 0.0
+            'longitude': -74.0060,
+            'padding': 'x' * 5000
         }
-        
+
         response = client.post(
             solar_geometry_url,
             data=json.dumps(data),
             content_type='application/json'
         )
-        
-        assert response.status_code == 400
+
+        assert response.status_code == 413
         result = json.loads(response.content)
-        assert 'Missing required parameter: longitude' in result['error']
+        assert 'must not exceed 4096 bytes' in result['error']
+        mock_orientation.assert_not_called()
     
-    def test_invalid_json(self, client, solar_geometry_url):
-        """Test API with invalid JSON"""
-        response = client.post(
+    def test_oversized_body_without_content_length_rejected(self, solar_geometry_url):
+        """Test the size limit also applies to bodies sent without a Content-Length"""
+        request = RequestFactory().post(
             solar_geometry_url,
-            data='invalid json',
+            data=json.dumps({'latitude': 40.7128, 'longitude': -74.0060, 'padding': 'x' * 5000}),
             content_type='application/json'
         )
-        
-        assert response.status_code == 400
-        result = json.loads(response.content)
-        assert 'error' in result
+        del request.META['CONTENT_LENGTH']  # as for a chunked request
+
+        data, error = _parse_json(request)
+
+        assert data is None
+        assert error.status_code == 413
     
     def test_get_method_not_allowed(self, client, solar_geometry_url):
         """Test that GET method is not allowed"""
@@ -298,11 +294,12 @@ class TestTestAPIView:
         result = json.loads(response.content)
         assert result['result'] == 'received: 2024-01-15'
     
-    def test_invalid_json(self, client, test_api_url):
-        """Test test API with invalid JSON"""
+    @pytest.mark.parametrize('body', ['invalid json', '', '[]'], ids=['invalid_json', 'empty_body', 'not_an_object'])
+    def test_invalid_json(self, client, test_api_url, body):
+        """Test test API with a body that is not a JSON object"""
         response = client.post(
             test_api_url,
-            data='invalid json',
+            data=body,
             content_type='application/json'
         )
         
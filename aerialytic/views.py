@@ -1,79 +1,109 @@
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-import json
+import orjson
+from orjson import JSONDecodeError
+from datetime import date
+from functools import lru_cache
 from .pv_modeling.optimal_orientation import get_optimal_orientation
+from .serializers import SolarGeometrySerializer
+
+
+def _json(obj: dict, status: int = 200) -> HttpResponse:
+    # orjson encodes straight to UTF-8 bytes, so the body needs no further encoding
+    return HttpResponse(orjson.dumps(obj), status=status, content_type='application/json')
+
+
+# The API bodies are a few numbers, so larger ones are refused. Under WSGI the
+# Content-Length check refuses them before the body is read. ASGI servers have already
+# buffered the body by the time the view runs, and chunked requests carry no
+# Content-Length, so the body that was read is checked too. This applies to the API views
+# only, the admin keeps Django's DATA_UPLOAD_MAX_MEMORY_SIZE.
+MAX_BODY_SIZE = 4096
+
+
+def _body_too_large() -> HttpResponse:
+    return _json({'error': f'Request body must not exceed {MAX_BODY_SIZE} bytes'}, status=413)
+
+
+def _parse_json(request: HttpRequest) -> tuple[object, HttpResponse | None]:
+    """Returns (data, None) for the decoded request body, or (None, error response)."""
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > MAX_BODY_SIZE:
+        return None, _body_too_large()
+
+    # request.body is read once, here
+    body = request.body
+    if len(body) > MAX_BODY_SIZE:
+        return None, _body_too_large()
+    try:
+        return orjson.loads(body), None
+    except JSONDecodeError as e:
+        return None, _json({'error': str(e)}, status=400)
+
+
+# Success body of solar_geometry_api_view, formatted directly instead of encoding a dict
+_SOLAR_GEOMETRY_TEMPLATE = (
+    b'{"latitude":%.6f,"longitude":%.6f,"offset":%.3f,"optimal_tilt":%.3f,'
+    b'"optimal_azimuth":%.3f,"effective_tilt":%.3f,"annual_irradiance_kwh_m2":%.2f}'
+)
+
+
+@lru_cache(maxsize=16384)
+def _cached_orientation(latitude: float, longitude: float, offset: float, day: date) -> dict:
+    # The modelled year starts on the day of the request, so results are kept per day
+    return get_optimal_orientation(latitude, longitude, offset)
+
+
+# Ground slopes are resolved to 0.01°. The view rounds the offset before the search, so the
+# effective tilt and the echoed offset agree with the cached result.
+OFFSET_DECIMALS = 2
+
+
+def _optimal_orientation(latitude: float, longitude: float, offset: float) -> dict:
+    # Nearby requests (to ~100 m) share one search
+    return _cached_orientation(round(latitude, 3), round(longitude, 3), offset, date.today())
+
 
 @csrf_exempt
 @require_POST
-def test_api_view(request):
-    try:
-        data = json.loads(request.body)
-        date = data.get('date')
-        return JsonResponse({'result': f'received: {date}'})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
+async def test_api_view(request: HttpRequest) -> HttpResponse:
+    data, error = _parse_json(request)
+    if error is not None:
+        return error
+    if not isinstance(data, dict):
+        return _json({'error': 'Expected a JSON object'}, status=400)
+
+    received = data.get('date')
+    return _json({'result': f'received: {received}'})
 
 @csrf_exempt
 @require_POST
-def solar_geometry_api_view(request):
-    try:
-        data = json.loads(request.body)
-        
-        # Check for required parameters
-        if 'latitude' not in data:
-            return JsonResponse({'error': 'Missing required parameter: latitude'}, status=400)
-        if 'longitude' not in data:
-            return JsonResponse({'error': 'Missing required parameter: longitude'}, status=400)
-        
-        # Validate and normalize latitude (-90 to 90)
-        try:
-            latitude_raw = float(data.get('latitude'))
-        except (TypeError, ValueError):
-            return JsonResponse({'error': 'Invalid latitude value'}, status=400)
-            
-        if latitude_raw < -360 or latitude_raw > 360:
-            raise ValueError("Latitude must be between -360 and 360")
-        # Normalize latitude to -90 to 90 range
-        if latitude_raw > 90:
-            latitude = 180 - latitude_raw
-        elif latitude_raw < -90:
-            latitude = -180 - latitude_raw
-        else:
-            latitude = latitude_raw
-        
-        # Validate and normalize longitude (-180 to 180)
-        try:
-            longitude_raw = float(data.get('longitude'))
-        except (TypeError, ValueError):
-            return JsonResponse({'error': 'Invalid longitude value'}, status=400)
-            
-        if longitude_raw < -360 or longitude_raw > 360:
-            raise ValueError("Longitude must be between -360 and 360")
-        longitude = ((longitude_raw + 180) % 360) - 180  # Normalize to -180 to 180
-        
-        # Handle offset
-        try:
-            offset = 0.0 if data.get('offset') is None else float(data.get('offset'))
-        except (TypeError, ValueError):
-            return JsonResponse({'error': 'Invalid offset value'}, status=400)
-        
-        # Validate offset (ground slope angle should be reasonable)
-        if offset < -90 or offset > 90:
-            raise ValueError("Offset (ground slope) must be between -90 and 90 degrees")
-        
-        result = get_optimal_orientation(latitude, longitude, offset)
-        
-        return JsonResponse({
-            'latitude': latitude,
-            'longitude': longitude,
-            'offset': offset,
-            'optimal_tilt': result['optimal_tilt'],
-            'optimal_azimuth': result['optimal_azimuth'],
-            'effective_tilt': result['effective_tilt'],
-            'annual_irradiance_kwh_m2': round(result['annual_irradiance_kwh_m2'], 2)
-        })
-    except ValueError as e:
-        return JsonResponse({'error': f'Invalid input values: {str(e)}'}, status=400)
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400) 
\ No newline at end of file
+async def solar_geometry_api_view(request: HttpRequest) -> HttpResponse:
+    data, error = _parse_json(request)
+    if error is not None:
+        return error
+
+    serializer = SolarGeometrySerializer(data=data)
+    if not serializer.is_valid():
+        return _json({'error': serializer.first_error}, status=400)
+    latitude, longitude, offset = serializer.validated_data.values()
+    offset = round(offset, OFFSET_DECIMALS)
+
+    # The search is CPU-bound, so it runs in a worker thread rather than on the event loop
+    result = await sync_to_async(_optimal_orientation, thread_sensitive=False)(latitude, longitude, offset)
+
+    content = _SOLAR_GEOMETRY_TEMPLATE % (
+        latitude,
+        longitude,
+        offset,
+        result['optimal_tilt'],
+        result['optimal_azimuth'],
+        result['effective_tilt'],
+        result['annual_irradiance_kwh_m2'],
+    )
+    return HttpResponse(content, content_type='application/json')